@@ -1,13 +1,36 @@
 import os
 import json
+import contextlib
+import errno
+import hashlib
 import logging
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from typing import Dict, Any, Optional
-from PyPDF2 import PdfReader
+import orjson
 import re
 from datetime import datetime
 
+try:
+    import pymupdf
+except ImportError:  # Fall back to pdfium's text extraction when PyMuPDF is not installed
+    pymupdf = None
+    import pypdfium2 as pdfium
+
+try:
+    import hyperscan
+except ImportError:  # Optional: without it patterns are ruled out by keyword substring checks
+    hyperscan = None
+
+try:
+    import ahocorasick
+except ImportError:  # Optional: without it countries are found with _COUNTRY_PATTERNS
+    ahocorasick = None
+
+@lru_cache(maxsize=1)
 def load_config() -> Dict[str, Any]:
-    """Load configuration from config.json file"""
+    """Load configuration from config.json file, once per process"""
     try:
         with open('config.json', 'r', encoding='utf-8') as f:
             return json.load(f)
@@ -24,6 +47,14 @@ def load_config() -> Dict[str, Any]:
         logging.error(f"Error parsing config.json: {str(e)}")
         raise
 
+# Configuration handed to each worker process once by _init_worker
+CONFIG: Optional[Dict[str, Any]] = None
+
+def _init_worker(config: Dict[str, Any]):
+    """Store the parent's configuration in a worker process"""
+    global CONFIG
+    CONFIG = config
+
 # Configure logging
 logging.basicConfig(
     level=logging.DEBUG,  # Changed to DEBUG level for more detailed output
@@ -34,14 +65,22 @@ logging.basicConfig(
     ]
 )
 
+# Fields validate_data() insists on
+REQUIRED_FIELDS = ["Invoice Number", "Date", "Net", "Total"]
+
+# Empty invoice record in output field order; copying it is cheaper than building the dict each time
+_RECORD_TEMPLATE = dict.fromkeys((
+    "Type", "Supplier", "Customer", "Nominal A/C", "Date", "Invoice Number",
+    "Description", "Net", "Tax Code", "VAT", "Total", "Customer Country",
+), "")
+
 class ValidationError(Exception):
     """Custom exception for data validation errors"""
     pass
 
 def validate_data(data: Dict[str, Any]) -> None:
     """Validate extracted data for consistency and completeness"""
-    required_fields = ["Invoice Number", "Date", "Net", "Total"]
-    missing_fields = [field for field in required_fields if not data.get(field)]
+    missing_fields = [field for field in REQUIRED_FIELDS if not data.get(field)]
     
     if missing_fields:
         raise ValidationError(f"Missing required fields: {', '.join(missing_fields)}")
@@ -65,41 +104,61 @@ def validate_data(data: Dict[str, Any]) -> None:
         except ValueError:
             raise ValidationError(f"Invalid date format: {data['Date']}")
             
+# Whitespace runs, collapsed to a single space
+_WS_RE = re.compile(r'\s+')
+
 def clean_text(text: str) -> str:
     """Clean and normalize extracted text"""
-    # Remove multiple spaces and normalize line endings
-    text = re.sub(r'\s+', ' ', text)
-    # Remove common OCR artifacts
-    text = re.sub(r'[^\x00-\x7F]+', '', text)  # Remove non-ASCII characters
-    text = re.sub(r'[^\S\n]+', ' ', text)      # Normalize horizontal whitespace
-    text = re.sub(r'\n{3,}', '\n\n', text)     # Normalize vertical whitespace
-    return text.strip()
-
-def extract_text_from_pdf(pdf_path):
-    """Extract text from PDF file"""
-    reader = PdfReader(pdf_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text()
-    return text
+    # Collapse all whitespace, newlines included, to single spaces and trim the ends;
+    # str.split() uses the same definition of whitespace as \s
+    text = ' '.join(text.split())
+    if text.isascii():
+        return text
+    # Remove common OCR artifacts (non-ASCII characters), then close up the gaps they leave
+    return ' '.join(text.encode('ascii', 'ignore').decode('ascii').split())
+
+def _extract_text_pdfium(pdf_path, start_page: int, max_pages: Optional[int]) -> str:
+    """Extract text from a range of pages with pypdfium2"""
+    # pdfium reads the file itself, so the path is passed straight through
+    doc = pdfium.PdfDocument(pdf_path)
+    try:
+        stop_page = len(doc) if max_pages is None else min(start_page + max_pages, len(doc))
+        page_texts = [doc[page_number].get_textpage().get_text_range() for page_number in range(start_page, stop_page)]
+    finally:
+        doc.close()
+    return "\n".join(page_texts)
+
+def extract_text_from_pdf(pdf_path, start_page: int = 0, max_pages: Optional[int] = None):
+    """Extract text from PDF file using PyMuPDF, optionally limited to a range of pages"""
+    if pymupdf is None:
+        return _extract_text_pdfium(pdf_path, start_page, max_pages)
+    
+    # Memory-map the file so MuPDF reads straight from the OS page cache instead
+    # of copying through buffered file I/O on every xref/object seek
+    with open(pdf_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as pdf_map:
+        with memoryview(pdf_map) as pdf_view, pymupdf.open(stream=pdf_view, filetype="pdf") as doc:
+            stop_page = doc.page_count if max_pages is None else min(start_page + max_pages, doc.page_count)
+            page_texts = [doc[page_number].get_text("text") for page_number in range(start_page, stop_page)]
+    return "\n".join(page_texts)
+
+# Common OCR misreads of digits, plus currency symbols and thousands separators stripped from amounts
+_AMOUNT_TABLE = str.maketrans('iIlOo', '11100', '£$€¥,')
 
 def parse_amount(text):
     """Extract and clean amount values"""
     if not text:
         return ""
-    # Remove currency symbols and convert to float
-    # Handle different currency symbols and formats
-    amount = text.strip()
-    amount = re.sub(r'[£$€¥]', '', amount)  # Remove currency symbols
-    amount = re.sub(r'[,\s]', '', amount)    # Remove commas and spaces
-    amount = re.sub(r'^-$', '0', amount)     # Convert lone dash to 0
-    
-    # Fix common OCR errors
-    amount = amount.replace('i', '1')  # Replace 'i' with '1'
-    amount = amount.replace('I', '1')  # Replace 'I' with '1'
-    amount = amount.replace('l', '1')  # Replace 'l' with '1'
-    amount = amount.replace('O', '0')  # Replace 'O' with '0'
-    amount = amount.replace('o', '0')  # Replace 'o' with '0'
+    if text.isascii() and text.replace('.', '', 1).isdigit():
+        # Most captures are already plain numbers: nothing to strip or translate
+        amount = text
+    else:
+        # Remove currency symbols and convert to float
+        # Handle different currency symbols and formats
+        amount = ''.join(text.split())            # Remove all whitespace
+        # Remove currency symbols and commas, and fix common OCR errors (i, I, l -> 1; O, o -> 0)
+        amount = amount.translate(_AMOUNT_TABLE)
+        if amount == '-':                         # Convert lone dash to 0
+            amount = '0'
     
     try:
         # Handle negative amounts with parentheses
@@ -123,25 +182,388 @@ def parse_amount(text):
     except ValueError:
         return ""
 
+# The field patterns below are written in lower case and matched against the
+# lower-cased text, which avoids case-insensitive matching at every position.
+# Gaps between a label and its value are bounded ({0,300}?) so a label with no
+# value after it cannot send the lazy scan on to the end of the text
+
+# Invoice number patterns for Camel Brand (CBM prefix), highest priority first
+_CBM_PATTERNS = [re.compile(p) for p in (
+    r'invoice\s+cbm\s+(\d{8})',  # Exact format: "Invoice CBM 10228019"
+    r'invoice\s*cbm\s*(\d{8})',  # Without spaces: "Invoice CBM10228019"
+    r'invoice\s+cbm\s+(\d{7})',  # 7-digit format: "Invoice CBM 1022801"
+    r'invoice\s*cbm\s*(\d{7})',  # 7-digit without spaces
+    r'invoice\s+cbm\s+(\d+)',    # Any digits after "Invoice CBM"
+    r'invoice\s*cbm\s*(\d+)',    # Any digits after "Invoice CBM" (no spaces)
+)]
+# Every _CBM_PATTERNS match is also a match of this anchor, so one scan for it
+# tells us where (and whether) the specific patterns need to start looking
+_CBM_ANCHOR_RE = re.compile(r'invoice\s*cbm\s*\d')
+
+# Fallback reference patterns used when no "Invoice CBM" number is found
+_CBM_FALLBACK_PATTERNS = [re.compile(p) for p in (
+    r'our\s*reference[.:\s]*(\d{5})/?',  # Reference number like "23025/"
+    r'our\s*reference[.:\s]*(\d{5})\s*/',  # Reference number like "23025 /"
+    r'reference[.:\s]*(\d{5})/?',  # Generic reference
+    r'our\s*reference[.:\s]*(\d{7,8})/?',  # Longer reference numbers (7-8 digits)
+    r'reference[.:\s]*(\d{7,8})/?',
+    r'order\s*no[.:\s]*(\d{5,8})',  # Order number as fallback
+)]
+
+# Invoice number patterns for Attard & Co (FD prefix)
+_FD_PATTERNS = [re.compile(p) for p in (
+    r'invoice\s*fd\s*(\d+)',  # Already has FD prefix
+    r'invoice\s*(?:no|number|#)[.:]\s*fd\s*(\d+)',  # Has FD prefix
+    r'invoice\s*(?:no|number|#)[.:]\s*(\d+)',  # Need to add prefix
+    r'invoice[.:]\s*(\d+)',  # Need to add prefix
+    r'reference[.:]\s*(\d+)',  # Need to add prefix
+    r'our\s*reference[.:\s]*(\d+)/?',  # Reference number format
+)]
+
+# Invoice number patterns by company directory: (patterns tried in order, prefix added
+# to the captured number, numbers to skip). Other directories use the Attard & Co entry.
+# CamelBrand's "Invoice CBM" patterns are tried before its entry, see parse_pdf_content
+_INVOICE_PATTERNS_BY_COMPANY = {
+    "CamelBrand": (_CBM_FALLBACK_PATTERNS, "CBM", frozenset({"21466292", "77886661"})),  # Known phone/customer numbers
+    "Attard&Co": (_FD_PATTERNS, "FD", frozenset()),
+}
+
+def _parse_numeric_date(date_str: str, separator: str, two_digit_year: bool) -> datetime:
+    """Parse a DD/MM/YYYY style date by hand; same result as strptime for that fixed format"""
+    day, month, year = date_str.split(separator)
+    if not (day.isdecimal() and len(day) <= 2 and month.isdecimal() and len(month) <= 2
+            and year.isdecimal() and len(year) == (2 if two_digit_year else 4)):
+        raise ValueError(f"time data {date_str!r} does not match a numeric date")
+    century = (2000 if int(year) <= 68 else 1900) if two_digit_year else 0
+    # datetime() still rejects out-of-range days and months, just like strptime
+    return datetime(century + int(year), int(month), int(day))
+
+# Numeric strptime formats handled by _parse_numeric_date: (separator, two_digit_year)
+_NUMERIC_DATE_FORMATS = {
+    '%d/%m/%Y': ('/', False),
+    '%d-%m-%Y': ('-', False),
+    '%d/%m/%y': ('/', True),
+    '%d-%m-%y': ('-', True),
+}
+
+def _numeric_date_format(date_str: str) -> str:
+    """The only numeric format a DD/MM/YY(YY) match can parse with, from its separator and year length"""
+    separator = '/' if '/' in date_str else '-'
+    year = 'y' if len(date_str.rsplit(separator, 1)[-1]) == 2 else 'Y'
+    return f'%d{separator}%m{separator}%{year}'
+
+def _meridiem_format(format_24h: str, format_am_pm: str):
+    """Pick the AM/PM format for times ending in AM or PM, the 24-hour one otherwise"""
+    return lambda date_str: format_am_pm if date_str[-2:].lower() in ('am', 'pm') else format_24h
+
+# Date patterns paired with the one strptime format their match can parse with. Where a
+# pattern covers several layouts, a function picks the format from the matched text,
+# so each match is parsed once instead of trying every format until one fits
+_DATE_PATTERNS = [(re.compile(p), date_format) for p, date_format in (
+    (r'date[.:]\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})', _numeric_date_format),
+    (r'date[.:]\s*(\d{1,2}-[a-z]+-\d{4}\s+\d{2}:\d{2}:\d{2}(?:am|pm)?)', _meridiem_format('%d-%b-%Y %H:%M:%S', '%d-%b-%Y %I:%M:%S%p')),
+    (r'date[.:]\s*(\d{1,2}-[a-z]+-\d{4})', '%d-%b-%Y'),
+    (r'date[.:\s]*(\d{1,2}-[a-z]+-\d{4}\s+\d{2}:\d{2}:\d{2})', '%d-%b-%Y %H:%M:%S'),
+    (r'date[.:\s]*(\d{1,2}-[a-z]+-\d{4}\s+\d{2}\.\d{2}.\d{2}(?:am|pm)?)', _meridiem_format('%d-%b-%Y %H.%M.%S', '%d-%b-%Y %I.%M.%S%p')),
+    (r'date[.:\s]+(\d{1,2}-[a-z]+-\d{4}\s+\d{2}:\d{2}:\d{2})', '%d-%b-%Y %H:%M:%S'),  # More flexible spacing
+    # Handle date patterns that appear after other fields (like in CamelBrand_0006)
+    (r'mt\s+\d+\s+(\d{1,2}-[a-z]+-\d{4}\s+\d{2}:\d{2}:\d{2})', '%d-%b-%Y %H:%M:%S'),
+    (r'(?:sales rep|our reference|order no|delivery by).{0,300}?(\d{1,2}-[a-z]+-\d{4}\s+\d{2}:\d{2}:\d{2})', '%d-%b-%Y %H:%M:%S'),
+    # Specific patterns for the failing cases
+    (r'date:\s*sales rep:.{0,300}?(\d{1,2}-[a-z]{3}-\d{4}\s+\d{2}:\d{2}:\d{2})', '%d-%b-%Y %H:%M:%S'),  # CamelBrand_0006 pattern
+    (r'date:\s*(\d{1,2}-[a-z]{3}-\d{4}\s+\d{2}:\d{2}:\d{2})', '%d-%b-%Y %H:%M:%S'),  # CamelBrand_0007 pattern
+    # More flexible patterns to catch dates anywhere in the text
+    (r'(\d{1,2}-[a-z]{3}-\d{4}\s+\d{2}:\d{2}:\d{2})', '%d-%b-%Y %H:%M:%S'),  # Generic date with time
+    # Even more specific patterns for exact matches
+    (r'mt\s+\d+\s+(\d{1,2}-[a-z]{3}-\d{4}\s+\d{2}:\d{2}:\d{2})', '%d-%b-%Y %H:%M:%S'),  # Pattern like "MT 21827731 4-Aug-2025 14:13:05"
+    # Patterns for the failing PDFs with different time formats
+    (r'(\d{1,2}-[a-z]{3}-\d{4}\s+\d{2}\.\d{2}\d{2}(?:am|pm))', '%d-%b-%Y %H.%M%S%p'),  # Pattern like "25-Aug-2025 01.5418PM"
+    (r'(\d{1,2}-[a-z]{3}-\d{4}\s+\d{2}\s+\d{2}\s+\d{2}(?:am|pm)?)', _meridiem_format('%d-%b-%Y %H %M %S', '%d-%b-%Y %H %M %S%p')),  # Pattern like "25-Aug-2025 01 54 18PM" or "28-Aug-2025 13 56 24"
+    (r'date due:\s*(\d{1,2}/\d{1,2}/\d{4})', '%d/%m/%Y'),
+    (r'(\d{1,2}(?:st|nd|rd|th)?\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{2,4})', lambda date_str: '%d %b %Y' if len(date_str.split()[1]) == 3 else '%d %B %Y'),
+    (r'(\d{4}[-/]\d{1,2}[-/]\d{1,2})', lambda date_str: '%Y/%m/%d' if '/' in date_str else '%Y-%m-%d')
+)]
+
+# Ordinal suffixes removed from matched dates ("1st" -> "1")
+_ORDINAL_RE = re.compile(r'(?:st|nd|rd|th)')
+
+# Amount patterns per field, tried in order until one matches. The order is a priority:
+# a later pattern must not win just because it matches earlier in the text, which is
+# what joining them into one alternation would do (and measured slower here anyway)
+_AMOUNT_PATTERNS = {
+    "Net": [re.compile(p) for p in (
+        r'net\s*amount\s*(?:in\s*eur\s*)?(\d+\.[\d]+)',  # Handle decimals properly
+        r'(?:net|subtotal|sub-total)[:\s]*[£$€]?\s*(\(?[\d,]+\.?[\d]*\)?)',
+        r'amount[:\s]*[£$€]?\s*(\(?[\d,]+\.?[\d]*\)?)',
+        r'net\s*amount\s*(?:vat\s*amt)?[:\s]*(\d+\.[\d]+)',  # CamelBrand format
+        # Handle patterns like "NetAmount E - 0% 57462"
+        r'netamount\s+(?:e\s*-\s*0%\s*)?(\d+)(?!\.\d)',
+        r'net\s*amount\s+(?:e\s*-\s*0%\s*)?(\d+\.[\d]+)',
+        # Additional patterns for CamelBrand_0001 type layouts
+        r'net\s*amount\s*retail\s*tc.{0,300}?(\d+\.?\d*)',  # Pattern with Retail TC
+        r'type[.\s]*supply\s*by\s*sale[^0-9]*?(\d+\.?\d*)',  # After "Supply by Sale"
+        # More comprehensive patterns for complex layouts
+        r'supply\s*by\s*sale\s*net\s*amount.{0,300}?(\d+\.?\d*)',  # After Supply by Sale Net Amount
+        r'net\s*amount.{0,300}?(\d{2,4}\.?\d*)',  # Net Amount with at least 2 digits
+        # Handle patterns after VAT summary
+        r'e\s*-\s*0%\s*(\d+)(?!\.\d)',  # Pattern like "E - 0% 57462"
+        r'0%\s*(\d+)(?!\.\d)'  # Pattern like "0% 57462"
+    )],
+    "VAT": [re.compile(p) for p in (
+        r'vat\s*amt\s*(\d+\.[\d]+)',
+        r'vat\s*amount\s*(\d+\.[\d]+)',
+        r'(?:vat|tax)[:\s]*[£$€]?\s*(\(?[\d,]+\.?[\d]*\)?)',
+        r'v\.a\.t\.[:\s]*[£$€]?\s*(\(?[\d,]+\.?[\d]*\)?)'
+    )],
+    "Total": [re.compile(p) for p in (
+        r'total\s*amount\s*in\s*eur\s*(\d+\.[\d]+)',
+        r'(?:total|amount due|balance due)[:\s]*[£$€]?\s*(\(?[\d,]+\.?[\d]*\)?)',
+        r'total\s+amount[:\s]*[£$€]?\s*(\(?[\d,]+\.?[\d]*\)?)',
+        r'total\s*amount\s*(?:in\s*eur\s*)?(\d+\.[\d]+)',  # CamelBrand format
+        r'total\s*amount\s*in\s*eur\s*(\d+)(?!\.\d)',  # Total with whole number
+        # Handle patterns like "Total Amount in EUR Received goods in good order& condition by574.62"
+        r'total\s*amount\s*in\s*eur.{0,300}?by(\d+\.[\d]+)',
+        # Additional patterns for edge cases like CamelBrand_0001
+        r'total\s*(?:amount\s*)?[:\s]*(\d+\.?\d*)',  # Generic Total pattern
+        r'balance[:\s]*(\d+\.?\d*)',  # Balance
+        # Pattern to match after VAT summary
+        r'vat\s*amount[^0-9]*?(\d+\.?\d*)',  # After VAT Amount
+        r'total\s*amount\s*in\s*eur.{0,300}?(\d+\.[\d]+)',  # More flexible
+        # Handle patterns in VAT summary
+        r'eur\s+(\d+\.[\d]+)'  # Simple EUR pattern
+    )]
+}
+
+# Country detection from the address block
+_COUNTRY_PATTERNS = [re.compile(p) for p in (
+    r'(?:qormi|zabbar|malta)',  # Common Malta locations
+    r'\b(?:uk|usa|united\s+kingdom|united\s+states|canada|australia|malta)\b'
+)]
+_UNITED_RE = re.compile(r'united\s+(?:kingdom|states)\b')
+
+def _build_country_automaton():
+    """Aho-Corasick automaton over the country keywords, mapped to whether they need word boundaries"""
+    automaton = ahocorasick.Automaton()
+    for keyword in ('qormi', 'zabbar', 'malta'):
+        automaton.add_word(keyword, (keyword, False))
+    # "united" is followed by any whitespace, so the rest is checked with _UNITED_RE
+    for keyword in ('uk', 'usa', 'united', 'canada', 'australia'):
+        automaton.add_word(keyword, (keyword, True))
+    automaton.make_automaton()
+    return automaton
+
+_COUNTRY_AUTOMATON = _build_country_automaton() if ahocorasick else None
+
+def _is_word_char(text: str, index: int) -> bool:
+    """Whether text[index] is a regex word character; False outside the text"""
+    return 0 <= index < len(text) and (text[index].isalnum() or text[index] == '_')
+
+def _find_country(text_lower: str) -> str:
+    """Same result as _COUNTRY_PATTERNS in one pass: any Malta location wins, else the first bounded country"""
+    country = ""
+    for end, (keyword, bounded) in _COUNTRY_AUTOMATON.iter(text_lower):
+        if not bounded:
+            return "MALTA"
+        start = end - len(keyword) + 1
+        if country or _is_word_char(text_lower, start - 1):
+            continue
+        if keyword == 'united':
+            united_match = _UNITED_RE.match(text_lower, start)
+            if united_match:
+                country = united_match.group().upper()
+        elif not _is_word_char(text_lower, end + 1):
+            country = keyword.upper()
+    return country
+
+# Attard & Co description section ends at the quantity/price headings; its individual product lines
+_DESC_SECTION_END_RE = re.compile(r'dual\s*qty|unit\s*price|qty\s*unit\s*price')
+_PRODUCT_LINE_RE = re.compile(r'(mortadella[^0-9\n]+|[a-z][a-z]+[^0-9\n]*?)(?=\s*\d+|\n\d+|\s*q\s*x|$)')
+
+# General description patterns
+_DESC_PATTERNS = [re.compile(p, re.DOTALL) for p in (
+    r'code\s+description\s*\w+\s+(.*?)(?=\s*(?:unit\s*price|disc%|net\s*amount|retail|tc|\d+\s*(?:kg|pcs|ea)))',
+    r'description\s*(.*?)(?=\s*(?:unit\s*price|disc%|net\s*amount|retail|tc|\d+\s*(?:kg|pcs|ea)))',
+)]
+# Description patterns delimited by line breaks, tried after the ones above; they can
+# only match text that still has newlines, so they are skipped for single-line text
+_DESC_BLOCK_PATTERNS = [re.compile(p, re.DOTALL) for p in (
+    r'(?:description|items|services)[.:]\s*(.*?)(?=\n\n|\n(?:amount|total|net|vat))',
+    r'(?:details|work\s+description)[.:]\s*(.*?)(?=\n\n|\n(?:amount|total|net|vat))',
+    r'(?<=\n\n)(.*?)(?=\n\n|\n(?:amount|total|net|vat))'  # Fallback: try to find description between blank lines
+)]
+
+# Last-resort description from a "CODE description 1.00 KG" style line item
+_LINE_ITEM_RE = re.compile(r'[a-z0-9]+\s+(.*?)(?=\s+\d+(?:\.\d+)?\s*(?:kg|pcs|ea))')
+# Quantity the line item has to end at; without one the lazy scan above runs to the end of the text from every word
+_QUANTITY_RE = re.compile(r'\s+\d+(?:\.\d+)?\s*(?:kg|pcs|ea)')
+
+# Trailing details cut from each Attard & Co product line, in order
+_PRODUCT_LINE_NOISE = [re.compile(p, flags) for p, flags in (
+    (r'\s+\d+\s*x\s*\d+.*$', 0),  # Remove "1 x 2"
+    (r'\s+SANT\s+DALMAI.*$', re.IGNORECASE),
+    (r'\s+Dual\s+Qty.*$', re.IGNORECASE),
+    (r'\s+\d+\s*(?:Kgs?|kg).*$', re.IGNORECASE),
+    (r'\s+\d{3,}.*$', 0),  # Remove numbers like "355"
+    (r'\s*\n.*$', 0),  # Remove everything after newline
+)]
+
+# Leading markers and trailing details cut from a general description, in order
+_DESC_NOISE = [re.compile(p, flags) for p, flags in (
+    (r'^[-*•]\s*', 0),  # Remove list markers
+    (r'^[A-Z0-9]+\s+', 0),  # Remove any product codes that might be at the start
+    (r'\s+\d+(?:\.\d+)?\s*(?:KG|PCS|EA).*$', re.IGNORECASE),  # Remove any quantity information at the end
+    # Remove additional product details
+    (r'\s+\d+x\d+\s+SANT\s+DALMAI.*$', re.IGNORECASE),
+    (r'\s+Dual\s+Qty\s+Qty.*$', re.IGNORECASE),
+    (r'\s+\d+\s*x\s*\d+.*$', re.IGNORECASE),
+    (r'\s+Q\s*x\s*\d+.*$', re.IGNORECASE),
+)]
+
+def _has_top_level_alternation(regex: str) -> bool:
+    """Whether regex contains a | outside any group or character class"""
+    depth = 0
+    index = 0
+    while index < len(regex):
+        char = regex[index]
+        if char == '\\':
+            index += 2
+            continue
+        if char == '[':
+            # Skip the class; a ] right after [ or [^ is part of it
+            index += 1
+            if regex[index:index + 1] == '^':
+                index += 1
+            if regex[index:index + 1] == ']':
+                index += 1
+            while index < len(regex) and regex[index] != ']':
+                index += 2 if regex[index] == '\\' else 1
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            return True
+        index += 1
+    return False
+
+def _leading_literal(regex: str) -> str:
+    """Return the literal text that every match of a regex has to start with"""
+    # With a top-level alternation a match may start with any of the branches
+    if _has_top_level_alternation(regex):
+        return ''
+    literal = []
+    for char in regex:
+        if char in '\\.^$*+?{}[]|()':
+            # A following quantifier may make the last character optional
+            if char in '*?{' and literal:
+                literal.pop()
+            break
+        literal.append(char)
+    return ''.join(literal)
+
+# Lower-cased leading keyword of each pattern tried in turn by parse_pdf_content
+_PATTERN_KEYWORDS = {
+    pattern: _leading_literal(pattern.pattern).lower()
+    for pattern in (
+        *_CBM_FALLBACK_PATTERNS,
+        *_FD_PATTERNS,
+        *(pattern for pattern, _ in _DATE_PATTERNS),
+        *(pattern for patterns in _AMOUNT_PATTERNS.values() for pattern in patterns),
+        *_COUNTRY_PATTERNS,
+        *_DESC_PATTERNS,
+        *_DESC_BLOCK_PATTERNS,
+    )
+}
+_KEYWORDS = sorted({keyword for keyword in _PATTERN_KEYWORDS.values() if keyword})
+_PREFILTER_PATTERNS = list(_PATTERN_KEYWORDS)
+
+# Python's \s also matches these ASCII separators, Hyperscan's does not
+_HS_SEPARATOR_TABLE = str.maketrans('\x1c\x1d\x1e\x1f', '    ')
+
+def _hyperscan_expression(regex: str) -> bytes:
+    """Pattern as given to Hyperscan, with the bounded gaps left unbounded"""
+    # Bounded repeats are very slow for Hyperscan to compile; .* matches a superset,
+    # which is all prefilter mode needs
+    return regex.replace('.{0,300}?', '.*').encode('utf-8')
+
+def _build_pattern_database():
+    """Compile the field patterns into a single Hyperscan database in prefilter mode"""
+    if hyperscan is None:
+        return None
+    # Prefilter mode may report a pattern that re then fails to match, but never misses one that re would match
+    base_flags = hyperscan.HS_FLAG_PREFILTER | hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_ALLOWEMPTY | hyperscan.HS_FLAG_UTF8
+    database = hyperscan.Database()
+    try:
+        database.compile(
+            expressions=[_hyperscan_expression(pattern.pattern) for pattern in _PREFILTER_PATTERNS],
+            ids=list(range(len(_PREFILTER_PATTERNS))),
+            elements=len(_PREFILTER_PATTERNS),
+            flags=[base_flags | (hyperscan.HS_FLAG_DOTALL if pattern.flags & re.DOTALL else 0) for pattern in _PREFILTER_PATTERNS],
+        )
+    except hyperscan.error as e:
+        logging.warning(f"Hyperscan could not compile the field patterns, using keyword checks instead: {str(e)}")
+        return None
+    return database
+
+_PATTERN_DATABASE = _build_pattern_database()
+
+def _find_candidates(text_lower: str) -> set:
+    """Return the field patterns that may match the lower-cased text"""
+    # Hyperscan and re only agree on character classes for ASCII text
+    if _PATTERN_DATABASE is not None and text_lower.isascii():
+        candidates = set()
+
+        def on_match(pattern_id, start, end, flags, context):
+            candidates.add(_PREFILTER_PATTERNS[pattern_id])
+
+        _PATTERN_DATABASE.scan(text_lower.translate(_HS_SEPARATOR_TABLE).encode('ascii'), match_event_handler=on_match)
+        return candidates
+    
+    # Otherwise rule out the patterns whose leading keyword is missing;
+    # plain substring checks are still far cheaper than a failing regex
+    found = {keyword for keyword in _KEYWORDS if keyword in text_lower}
+    return {pattern for pattern, keyword in _PATTERN_KEYWORDS.items() if not keyword or keyword in found}
+
+def _search(pattern, text_lower: str, candidates: set):
+    """Search the lower-cased text with pattern unless it is known not to match"""
+    if pattern not in candidates:
+        return None
+    return pattern.search(text_lower)
+
+def _group(match, text: str) -> str:
+    """Return group 1 of a match against the lower-cased text in its original case"""
+    return text[match.start(1):match.end(1)]
+
+def _find_description_section(text_lower: str) -> Optional[slice]:
+    """Return the span between the first "Description" heading and the quantity/price headings"""
+    start = text_lower.find('description')
+    if start == -1:
+        return None
+    start += len('description')
+    end_match = _DESC_SECTION_END_RE.search(text_lower, start)
+    if not end_match:
+        return None
+    # Skip the whitespace after the heading
+    while text_lower[start].isspace():
+        start += 1
+    return slice(start, end_match.start())
+
 def parse_pdf_content(text, company_dir: str = ""):
     """Parse the extracted text and return structured data"""
-    # Load configuration
-    config = load_config()
+    # Load configuration, unless the worker was already given it
+    config = CONFIG if CONFIG is not None else load_config()
+    
+    data = _RECORD_TEMPLATE.copy()
+    data["Type"] = config.get("default_type", "PI")
+    data["Customer"] = config.get("customer", "")
+    data["Nominal A/C"] = config.get("nominal_ac", "5000")
+    
+    # Patterns match against a lower-cased copy and captures are sliced back out of text.
+    # U+0130 is the only character str.lower() expands, so mapping it first keeps offsets aligned
+    text_lower = text.replace('\u0130', 'i').lower()
     
-    data = {
-        "Type": config.get("default_type", "PI"),
-        "Supplier": "",  # Will be set based on directory
-        "Customer": config.get("customer", ""),
-        "Nominal A/C": config.get("nominal_ac", "5000"),
-        "Date": "",
-        "Invoice Number": "",
-        "Description": "",
-        "Net": "",
-        "Tax Code": "",
-        "VAT": "",
-        "Total": "",
-        "Customer Country": ""
-    }
+    # Rule out the field patterns that cannot match with one scan up front
+    candidates = _find_candidates(text_lower)
     
     # Set supplier name based on directory
     if company_dir:
@@ -150,175 +572,63 @@ def parse_pdf_content(text, company_dir: str = ""):
     # Extract invoice number - prioritize exact "Invoice CBM" format
     if company_dir == "CamelBrand":
         # First, try to find the exact "Invoice CBM" format (highest priority)
-        cbm_specific_patterns = [
-            r'Invoice\s+CBM\s+(\d{8})',  # Exact format: "Invoice CBM 10228019"
-            r'Invoice\s*CBM\s*(\d{8})',  # Without spaces: "Invoice CBM10228019"
-            r'Invoice\s+CBM\s+(\d{7})',  # 7-digit format: "Invoice CBM 1022801"
-            r'Invoice\s*CBM\s*(\d{7})',  # 7-digit without spaces
-            r'Invoice\s+CBM\s+(\d+)',    # Any digits after "Invoice CBM"
-            r'Invoice\s*CBM\s*(\d+)',    # Any digits after "Invoice CBM" (no spaces)
-        ]
-        
-        for pattern in cbm_specific_patterns:
-            invoice_match = re.search(pattern, text, re.IGNORECASE)
-            if invoice_match:
-                invoice_num = invoice_match.group(1)
-                data["Invoice Number"] = f"CBM{invoice_num}"
-                logging.info(f"Found CBM invoice number using pattern '{pattern}': CBM{invoice_num}")
-                break
-        
-        # If no "Invoice CBM" found, try fallback patterns (lower priority)
-        if not data["Invoice Number"]:
-            fallback_patterns = [
-                r'Our\s*Reference[.:\s]*(\d{5})/?',  # Reference number like "23025/"
-                r'Our\s*Reference[.:\s]*(\d{5})\s*/',  # Reference number like "23025 /"  
-                r'Reference[.:\s]*(\d{5})/?',  # Generic reference
-                r'Our\s*Reference[.:\s]*(\d{7,8})/?',  # Longer reference numbers (7-8 digits)
-                r'Reference[.:\s]*(\d{7,8})/?',
-                r'Order\s*No[.:\s]*(\d{5,8})',  # Order number as fallback
-            ]
-            for pattern in fallback_patterns:
-                ref_match = re.search(pattern, text, re.IGNORECASE)
-                if ref_match:
-                    ref_num = ref_match.group(1)
-                    # Only use numbers that look like invoice numbers and exclude known phone numbers
-                    if len(ref_num) >= 5 and ref_num not in ["21466292", "77886661"]:  # Exclude known phone/customer numbers
-                        data["Invoice Number"] = f"CBM{ref_num}"
-                        logging.info(f"Found CBM invoice number using fallback pattern '{pattern}': CBM{ref_num}")
-                        break
-    else:
-        # For Attard & Co (FD prefix)
-        fd_patterns = [
-            r'Invoice\s*FD\s*(\d+)',  # Already has FD prefix
-            r'Invoice\s*(?:No|Number|#)[.:]\s*FD\s*(\d+)',  # Has FD prefix
-            r'Invoice\s*(?:No|Number|#)[.:]\s*(\d+)',  # Need to add prefix
-            r'Invoice[.:]\s*(\d+)',  # Need to add prefix
-            r'Reference[.:]\s*(\d+)',  # Need to add prefix
-            r'Our\s*Reference[.:\s]*(\d+)/?',  # Reference number format
-        ]
-        
-        for pattern in fd_patterns:
-            invoice_match = re.search(pattern, text, re.IGNORECASE)
+        cbm_anchor = _CBM_ANCHOR_RE.search(text_lower)
+        if cbm_anchor:
+            for pattern in _CBM_PATTERNS:
+                invoice_match = pattern.search(text_lower, cbm_anchor.start())
+                if invoice_match:
+                    invoice_num = _group(invoice_match, text)
+                    data["Invoice Number"] = f"CBM{invoice_num}"
+                    logging.info(f"Found CBM invoice number using pattern '{pattern.pattern}': CBM{invoice_num}")
+                    break
+    
+    # Otherwise try the company's patterns (for CamelBrand, its lower priority fallbacks)
+    if not data["Invoice Number"]:
+        patterns, prefix, excluded = _INVOICE_PATTERNS_BY_COMPANY.get(company_dir, _INVOICE_PATTERNS_BY_COMPANY["Attard&Co"])
+        for pattern in patterns:
+            invoice_match = _search(pattern, text_lower, candidates)
             if invoice_match:
-                invoice_num = invoice_match.group(1)
-                # Add FD prefix if not already present
-                data["Invoice Number"] = f"FD{invoice_num}" if not invoice_num.startswith("FD") else invoice_num
+                invoice_num = _group(invoice_match, text)
+                if invoice_num in excluded:
+                    continue
+                # Add the prefix if not already present
+                data["Invoice Number"] = invoice_num if invoice_num.startswith(prefix) else f"{prefix}{invoice_num}"
                 break
     
     
     # Extract date - handle various formats
-    date_patterns = [
-        (r'Date[.:]\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})', ['%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y']),
-        (r'Date[.:]\s*(\d{1,2}-[A-Za-z]+-\d{4}\s+\d{2}:\d{2}:\d{2}(?:AM|PM)?)', ['%d-%b-%Y %H:%M:%S', '%d-%b-%Y %I:%M:%S%p']),
-        (r'Date[.:]\s*(\d{1,2}-[A-Za-z]+-\d{4})', ['%d-%b-%Y']),
-        (r'Date[.:\s]*(\d{1,2}-[A-Za-z]+-\d{4}\s+\d{2}:\d{2}:\d{2})', ['%d-%b-%Y %H:%M:%S']),
-        (r'Date[.:\s]*(\d{1,2}-[A-Za-z]+-\d{4}\s+\d{2}\.\d{2}.\d{2}(?:AM|PM)?)', ['%d-%b-%Y %H.%M.%S', '%d-%b-%Y %I.%M.%S%p']),
-        (r'Date[.:\s]+(\d{1,2}-[A-Za-z]+-\d{4}\s+\d{2}:\d{2}:\d{2})', ['%d-%b-%Y %H:%M:%S']),  # More flexible spacing
-        # Handle date patterns that appear after other fields (like in CamelBrand_0006)
-        (r'MT\s+\d+\s+(\d{1,2}-[A-Za-z]+-\d{4}\s+\d{2}:\d{2}:\d{2})', ['%d-%b-%Y %H:%M:%S']),
-        (r'(?:Sales Rep|Our Reference|Order No|Delivery By).*?(\d{1,2}-[A-Za-z]+-\d{4}\s+\d{2}:\d{2}:\d{2})', ['%d-%b-%Y %H:%M:%S']),
-        # Specific patterns for the failing cases
-        (r'Date:\s*Sales Rep:.*?(\d{1,2}-[A-Za-z]{3}-\d{4}\s+\d{2}:\d{2}:\d{2})', ['%d-%b-%Y %H:%M:%S']),  # CamelBrand_0006 pattern
-        (r'Date:\s*(\d{1,2}-[A-Za-z]{3}-\d{4}\s+\d{2}:\d{2}:\d{2})', ['%d-%b-%Y %H:%M:%S']),  # CamelBrand_0007 pattern
-        # More flexible patterns to catch dates anywhere in the text
-        (r'(\d{1,2}-[A-Za-z]{3}-\d{4}\s+\d{2}:\d{2}:\d{2})', ['%d-%b-%Y %H:%M:%S']),  # Generic date with time
-        # Even more specific patterns for exact matches
-        (r'MT\s+\d+\s+(\d{1,2}-[A-Za-z]{3}-\d{4}\s+\d{2}:\d{2}:\d{2})', ['%d-%b-%Y %H:%M:%S']),  # Pattern like "MT 21827731 4-Aug-2025 14:13:05"
-        # Patterns for the failing PDFs with different time formats
-        (r'(\d{1,2}-[A-Za-z]{3}-\d{4}\s+\d{2}\.\d{2}\d{2}(?:AM|PM))', ['%d-%b-%Y %H.%M%S%p']),  # Pattern like "25-Aug-2025 01.5418PM"
-        (r'(\d{1,2}-[A-Za-z]{3}-\d{4}\s+\d{2}\s+\d{2}\s+\d{2}(?:AM|PM)?)', ['%d-%b-%Y %H %M %S', '%d-%b-%Y %H %M %S%p']),  # Pattern like "25-Aug-2025 01 54 18PM" or "28-Aug-2025 13 56 24"
-        (r'Date Due:\s*(\d{1,2}/\d{1,2}/\d{4})', ['%d/%m/%Y']),
-        (r'(\d{1,2}(?:st|nd|rd|th)?\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.?\s+\d{2,4})', ['%d %B %Y', '%d %b %Y']),
-        (r'(\d{4}[-/]\d{1,2}[-/]\d{1,2})', ['%Y-%m-%d', '%Y/%m/%d'])
-    ]
     
-    for pattern, formats in date_patterns:
-        date_match = re.search(pattern, text, re.IGNORECASE)
+    for pattern, date_format in _DATE_PATTERNS:
+        date_match = _search(pattern, text_lower, candidates)
         if date_match:
-            date_str = date_match.group(1)
+            date_str = _group(date_match, text)
             # Remove ordinal indicators but keep original separators for proper format matching
-            date_str = re.sub(r'(?:st|nd|rd|th)', '', date_str)
+            date_str = _ORDINAL_RE.sub('', date_str)
             
-            for date_format in formats:
-                try:
+            if callable(date_format):
+                date_format = date_format(date_str)
+            try:
+                numeric_format = _NUMERIC_DATE_FORMATS.get(date_format)
+                if numeric_format:
+                    date_obj = _parse_numeric_date(date_str, *numeric_format)
+                else:
                     date_obj = datetime.strptime(date_str, date_format)
-                    data["Date"] = date_obj.strftime('%d/%m/%Y')  # Changed to dd/mm/yyyy format
-                    break
-                except ValueError:
-                    continue
-            if data["Date"]:  # If we successfully parsed a date
-                break
+            except ValueError:
+                continue
+            data["Date"] = date_obj.strftime('%d/%m/%Y')  # Changed to dd/mm/yyyy format
+            break
     
     # Check for date override in configuration
     if data["Invoice Number"] in config.get("date_overrides", {}):
         data["Date"] = config["date_overrides"][data["Invoice Number"]]
     
-    # Extract amounts with more flexible patterns
-    amount_patterns = {
-        "Net": [
-            r'Net\s*Amount\s*(?:in\s*EUR\s*)?(\d+\.[\d]+)',  # Handle decimals properly
-            r'(?:Net|Subtotal|Sub-total)[:\s]*[£$€]?\s*(\(?[\d,]+\.?[\d]*\)?)',
-            r'Amount[:\s]*[£$€]?\s*(\(?[\d,]+\.?[\d]*\)?)',
-            r'NetAmount\s*(\d+\.[\d]+)',  # No space variation
-            r'Net\s*Amount\s*(?:VAT\s*Amt)?[:\s]*(\d+\.[\d]+)',  # CamelBrand format
-            r'Net\s*Amount\s+(\d+\.[\d]+)',  # With spaces
-            r'NetAmount\s+(\d+\.[\d]+)',  # NetAmount with space
-            r'NetAmount\s+(\d+)(?!\.\d)',  # NetAmount with whole number (no decimal)
-            r'Net\s*Amount\s+(\d+)(?!\.\d)',  # Net Amount with whole number
-            # Handle patterns like "NetAmount E - 0% 57462"
-            r'NetAmount\s+(?:E\s*-\s*0%\s*)?(\d+)(?!\.\d)',
-            r'Net\s*Amount\s+(?:E\s*-\s*0%\s*)?(\d+\.[\d]+)',
-            # Additional patterns for CamelBrand_0001 type layouts
-            r'Net\s*Amount\s*Retail\s*TC.*?(\d+\.?\d*)',  # Pattern with Retail TC
-            r'Type[.\s]*Supply\s*by\s*Sale[^0-9]*?(\d+\.?\d*)',  # After "Supply by Sale"
-            # More comprehensive patterns for complex layouts
-            r'Supply\s*by\s*Sale\s*Net\s*Amount.*?(\d+\.?\d*)',  # After Supply by Sale Net Amount
-            r'Net\s*Amount.*?(\d{2,4}\.?\d*)',  # Net Amount with at least 2 digits
-            # Handle patterns after VAT summary
-            r'E\s*-\s*0%\s*(\d+)(?!\.\d)',  # Pattern like "E - 0% 57462"
-            r'0%\s*(\d+)(?!\.\d)'  # Pattern like "0% 57462"
-        ],
-        "VAT": [
-            r'VAT\s*Amt\s*(\d+\.[\d]+)',
-            r'VAT\s*Amount\s*(\d+\.[\d]+)',
-            r'(?:VAT|Tax)[:\s]*[£$€]?\s*(\(?[\d,]+\.?[\d]*\)?)',
-            r'V\.A\.T\.[:\s]*[£$€]?\s*(\(?[\d,]+\.?[\d]*\)?)',
-            r'VATAmount\s*(\d+\.[\d]+)',  # No space variation
-            r'VAT\s*Amount\s+(\d+\.[\d]+)',  # With spaces
-            r'VATAmount\s+(\d+\.[\d]+)',  # VATAmount with space
-            r'VAT\s*Amt\s+(\d+\.[\d]+)',  # VAT Amt with space
-            r'VAT\s*Amt\s+(\d+\.[\d]+)'  # VAT Amt with space
-        ],
-        "Total": [
-            r'Total\s*Amount\s*in\s*EUR\s*(\d+\.[\d]+)',
-            r'(?:Total|Amount Due|Balance Due)[:\s]*[£$€]?\s*(\(?[\d,]+\.?[\d]*\)?)',
-            r'Total\s+Amount[:\s]*[£$€]?\s*(\(?[\d,]+\.?[\d]*\)?)',
-            r'Total\s*Amount\s*(?:in\s*EUR\s*)?(\d+\.[\d]+)',  # CamelBrand format
-            r'Total\s*Amount\s+in\s+EUR\s+(\d+\.[\d]+)',  # With spaces
-            r'TotalAmount\s*(\d+\.[\d]+)',  # No space variation
-            r'Total\s+Amount\s+in\s+EUR\s+(\d+\.[\d]+)',  # More flexible spacing
-            r'Total\s*Amount\s*in\s*EUR\s*(\d+)(?!\.\d)',  # Total with whole number
-            # Handle patterns like "Total Amount in EUR Received goods in good order& condition by574.62"
-            r'Total\s*Amount\s*in\s*EUR.*?by(\d+\.[\d]+)',
-            # Additional patterns for edge cases like CamelBrand_0001
-            r'Total\s*(?:Amount\s*)?[:\s]*(\d+\.?\d*)',  # Generic Total pattern
-            r'Grand\s*Total[:\s]*(\d+\.?\d*)',  # Grand Total
-            r'Balance[:\s]*(\d+\.?\d*)',  # Balance
-            # Pattern to match after VAT summary
-            r'VAT\s*Amount[^0-9]*?(\d+\.?\d*)',  # After VAT Amount
-            r'Total\s*Amount\s*in\s*EUR.*?(\d+\.[\d]+)',  # More flexible
-            # Handle patterns in VAT summary
-            r'Total\s*Amount\s*in\s*EUR\s+(\d+\.[\d]+)',
-            r'EUR\s+(\d+\.[\d]+)'  # Simple EUR pattern
-        ]
-    }
     
     # Process amounts and set VAT code based on VAT amount
-    for field, patterns in amount_patterns.items():
+    for field, patterns in _AMOUNT_PATTERNS.items():
         for pattern in patterns:
-            amount_match = re.search(pattern, text, re.IGNORECASE)
+            amount_match = _search(pattern, text_lower, candidates)
             if amount_match:
-                amount = parse_amount(amount_match.group(1))
+                amount = parse_amount(_group(amount_match, text))
                 data[field] = amount
                 if field == "VAT":
                     # Set Tax Code based on VAT amount
@@ -336,40 +646,33 @@ def parse_pdf_content(text, company_dir: str = ""):
     data["Customer"] = "IG International Ltd"
     
     # Try to extract country from address
-    country_patterns = [
-        r'(?:QORMI|ZABBAR|MALTA)',  # Common Malta locations
-        r'\b(?:UK|USA|UNITED\s+KINGDOM|UNITED\s+STATES|CANADA|AUSTRALIA|MALTA)\b'
-    ]
-    
-    for pattern in country_patterns:
-        country_match = re.search(pattern, text, re.IGNORECASE)
-        if country_match:
-            data["Customer Country"] = "MALTA" if country_match.group().upper() in ["QORMI", "ZABBAR"] else country_match.group().upper()
-            break
+    if _COUNTRY_AUTOMATON is not None:
+        data["Customer Country"] = _find_country(text_lower)
+    else:
+        for pattern in _COUNTRY_PATTERNS:
+            country_match = _search(pattern, text_lower, candidates)
+            if country_match:
+                data["Customer Country"] = "MALTA" if country_match.group().upper() in ["QORMI", "ZABBAR"] else country_match.group().upper()
+                break
     
     # Extract description with improved pattern
     # Special handling for Attard & Co invoices with multiple line items
     if company_dir == "Attard&Co":
         # Look for descriptions section and extract all product lines
-        desc_section_pattern = r'Description\s*(.*?)(?=Dual\s*Qty|Unit\s*Price|Qty\s*Unit\s*Price)'
-        desc_section_match = re.search(desc_section_pattern, text, re.IGNORECASE | re.DOTALL)
+        desc_section = _find_description_section(text_lower)
         
-        if desc_section_match:
-            desc_section = desc_section_match.group(1)
+        if desc_section is not None:
             # Extract individual product lines that start with product names
-            product_lines = re.findall(r'(Mortadella[^0-9\n]+|[A-Z][a-z]+[^0-9\n]*?)(?=\s*\d+|\n\d+|\s*Q\s*x|$)', desc_section, re.IGNORECASE)
+            section_text = text[desc_section]
+            product_lines = [_group(match, section_text) for match in _PRODUCT_LINE_RE.finditer(text_lower[desc_section])]
             
             descriptions = []
             for line in product_lines:
                 # Clean up the description
                 cleaned_desc = line.strip()
                 # Remove common patterns
-                cleaned_desc = re.sub(r'\s+\d+\s*x\s*\d+.*$', '', cleaned_desc)  # Remove "1 x 2"
-                cleaned_desc = re.sub(r'\s+SANT\s+DALMAI.*$', '', cleaned_desc, flags=re.IGNORECASE)
-                cleaned_desc = re.sub(r'\s+Dual\s+Qty.*$', '', cleaned_desc, flags=re.IGNORECASE)
-                cleaned_desc = re.sub(r'\s+\d+\s*(?:Kgs?|kg).*$', '', cleaned_desc, flags=re.IGNORECASE)
-                cleaned_desc = re.sub(r'\s+\d{3,}.*$', '', cleaned_desc)  # Remove numbers like "355"
-                cleaned_desc = re.sub(r'\s*\n.*$', '', cleaned_desc)  # Remove everything after newline
+                for noise in _PRODUCT_LINE_NOISE:
+                    cleaned_desc = noise.sub('', cleaned_desc)
                 
                 if cleaned_desc and len(cleaned_desc) > 3:  # Only add meaningful descriptions
                     descriptions.append(cleaned_desc.strip())
@@ -380,59 +683,207 @@ def parse_pdf_content(text, company_dir: str = ""):
 
     # If no description found yet, try general patterns
     if not data["Description"]:
-        description_patterns = [
-            r'Code\s+Description\s*\w+\s+(.*?)(?=\s*(?:Unit\s*Price|Disc%|Net\s*Amount|Retail|TC|\d+\s*(?:KG|PCS|EA)))',
-            r'Description\s*(.*?)(?=\s*(?:Unit\s*Price|Disc%|Net\s*Amount|Retail|TC|\d+\s*(?:KG|PCS|EA)))',
-            r'(?:Description|Items|Services)[.:]\s*(.*?)(?=\n\n|\n(?:Amount|Total|Net|VAT))',
-            r'(?:Details|Work\s+Description)[.:]\s*(.*?)(?=\n\n|\n(?:Amount|Total|Net|VAT))',
-            r'(?<=\n\n)(.*?)(?=\n\n|\n(?:Amount|Total|Net|VAT))'  # Fallback: try to find description between blank lines
-        ]
-        for pattern in description_patterns:
-            desc_match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+        desc_patterns = _DESC_PATTERNS + _DESC_BLOCK_PATTERNS if '\n' in text else _DESC_PATTERNS
+        for pattern in desc_patterns:
+            desc_match = _search(pattern, text_lower, candidates)
             if desc_match:
-                description = desc_match.group(1).strip()
+                description = _group(desc_match, text).strip()
                 # Clean up the description
-                description = re.sub(r'\s+', ' ', description)  # Normalize whitespace
-                description = re.sub(r'^[-*•]\s*', '', description)  # Remove list markers
-                # Remove any product codes that might be at the start
-                description = re.sub(r'^[A-Z0-9]+\s+', '', description)
-                # Remove any quantity information at the end
-                description = re.sub(r'\s+\d+(?:\.\d+)?\s*(?:KG|PCS|EA).*$', '', description, flags=re.IGNORECASE)
-                # Remove additional product details
-                description = re.sub(r'\s+\d+x\d+\s+SANT\s+DALMAI.*$', '', description, flags=re.IGNORECASE)
-                description = re.sub(r'\s+Dual\s+Qty\s+Qty.*$', '', description, flags=re.IGNORECASE)
-                description = re.sub(r'\s+\d+\s*x\s*\d+.*$', '', description, flags=re.IGNORECASE)
-                description = re.sub(r'\s+Q\s*x\s*\d+.*$', '', description, flags=re.IGNORECASE)
+                description = _WS_RE.sub(' ', description)  # Normalize whitespace
+                for noise in _DESC_NOISE:
+                    description = noise.sub('', description)
                 data["Description"] = description.strip()
                 break
             
     # If no description found but we have a product code and description in the line items
-    if not data["Description"]:
-        line_item_match = re.search(r'[A-Z0-9]+\s+(.*?)(?=\s+\d+(?:\.\d+)?\s*(?:KG|PCS|EA))', text, re.IGNORECASE)
+    if not data["Description"] and _QUANTITY_RE.search(text_lower):
+        line_item_match = _LINE_ITEM_RE.search(text_lower)
         if line_item_match:
-            data["Description"] = line_item_match.group(1).strip()
+            data["Description"] = _group(line_item_match, text).strip()
     
     return data
 
+def file_digest(path: str) -> str:
+    """Return a BLAKE2b digest of a file's contents"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        # Hash in 1 MiB chunks so a large scan is never read into memory whole
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def extract_text_cached(pdf_path: str, cache_path: str, start_page: int = 0, max_pages: Optional[int] = None) -> str:
+    """Extract text from a PDF, reusing the copy saved at cache_path by an earlier run"""
+    try:
+        with open(cache_path, 'r', encoding='utf-8', newline='') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    
+    text = extract_text_from_pdf(pdf_path, start_page, max_pages)
+    
+    # Write to a temporary file first so a concurrent reader never sees a partial cache entry
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(text)
+    os.replace(temp_path, cache_path)
+    return text
+
+def get_max_pages(config: Dict[str, Any]) -> Optional[int]:
+    """Return the max_pages setting: a page count of at least 1, or None for no limit"""
+    max_pages = config.get("max_pages", 3)
+    if max_pages is not None and (type(max_pages) is not int or max_pages < 1):
+        raise ValueError(f"max_pages in config.json must be null or a whole number of at least 1, not {max_pages!r}")
+    return max_pages
+
+def extract_pdf_data(pdf_path: str, pdf_file: str, company_dir: str, cache_dir: str):
+    """Extract, clean and parse a single PDF; runs in a worker process"""
+    logging.info(f"Processing {pdf_file}")
+    
+    # Extracted text is cached by content hash, so unchanged PDFs are not re-extracted on later runs.
+    # The backend is part of the name because PyMuPDF and pdfium extract different text
+    cache_prefix = os.path.join(cache_dir, f"{file_digest(pdf_path)}_{'pymupdf' if pymupdf else 'pdfium'}")
+    
+    # Invoice fields are nearly always on the first page, so parse that on its own first
+    raw_text = extract_text_cached(pdf_path, f"{cache_prefix}_first.txt", max_pages=1)
+    text = clean_text(raw_text)
+    # An image-only (scanned) first page has no text layer, so there is nothing to parse yet
+    data = parse_pdf_content(text, company_dir) if raw_text.strip() else None
+    
+    # Only decompress and parse further pages if a required field is still missing,
+    # and never more than max_pages in total (null in config.json means no limit)
+    max_pages = get_max_pages(CONFIG if CONFIG is not None else load_config())
+    if (data is None or any(not data[field] for field in REQUIRED_FIELDS)) and max_pages != 1:
+        rest_pages = None if max_pages is None else max_pages - 1
+        remaining_text = extract_text_cached(pdf_path, f"{cache_prefix}_pages2-{'end' if max_pages is None else max_pages}.txt", start_page=1, max_pages=rest_pages)
+        # Image-only pages still join to newlines; without text there is nothing new to parse
+        if remaining_text.strip():
+            raw_text = f"{raw_text}\n{remaining_text}"
+            text = clean_text(raw_text)
+            data = None
+    
+    # Give up before any parsing when no page has a text layer
+    if not raw_text.strip():
+        raise ValueError("No text content extracted from PDF")
+    
+    if data is None:
+        data = parse_pdf_content(text, company_dir)
+    
+    # Log raw and cleaned text for debugging
+    logging.debug(f"Raw extracted text from {pdf_file}:\n{raw_text}")
+    logging.debug(f"Cleaned text from {pdf_file}:\n{text}")
+    
+    return text, data
+
+def find_pdf_files(directory: str, relative_dir: str = ""):
+    """Yield (path, path relative to the top directory, company directory) for each PDF, in os.walk order"""
+    try:
+        entries = os.scandir(directory)
+    except OSError:
+        return
+    
+    # DirEntry caches the file type from the directory listing, so no extra stat per file
+    subdirectories = []
+    with entries:
+        for entry in entries:
+            if entry.is_dir():
+                if not entry.is_symlink():
+                    subdirectories.append(entry)
+            elif entry.name.endswith('.pdf'):
+                # The company is the subdirectory the PDF was found in
+                yield entry.path, os.path.join(relative_dir, entry.name), relative_dir
+    
+    for entry in subdirectories:
+        yield from find_pdf_files(entry.path, os.path.join(relative_dir, entry.name))
+
+# O_BINARY keeps Windows from translating newlines; it is 0 (absent) elsewhere
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+_CREATE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+
+def _write_fd(fd: int, payload: bytes) -> None:
+    """Write all of payload without a buffered file object, and close fd"""
+    try:
+        # os.write may write less than asked; a regular file normally takes it in one call
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def _write_json(path: str, obj: Any) -> None:
+    """Write obj as indented JSON, replacing any existing file"""
+    payload = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    _write_fd(os.open(path, _WRITE_FLAGS, 0o666), payload)
+
+def _remove_files(paths) -> None:
+    """Delete files created by _write_exclusive, ignoring any that are already gone"""
+    for path in paths:
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+
+def _write_exclusive(files: list) -> bool:
+    """Create every (path, payload) file with O_EXCL and write it; False if a path already exists.
+    If anything fails, no file is left behind"""
+    paths = [path for path, _ in files]
+    fds = []
+    try:
+        for path in paths:
+            fds.append(os.open(path, _CREATE_FLAGS, 0o666))
+    except OSError as e:
+        for fd in fds:
+            os.close(fd)
+        _remove_files(paths[:len(fds)])
+        if e.errno == errno.EEXIST:
+            return False
+        raise
+    
+    # _write_fd closes each fd it is given, so on failure only the later ones are still open
+    written = 0
+    try:
+        for fd, (_, payload) in zip(fds, files):
+            written += 1
+            _write_fd(fd, payload)
+    except BaseException:
+        for fd in fds[written:]:
+            os.close(fd)
+        _remove_files(paths)
+        raise
+    return True
+
+def _dir_names(directory: str, cache: Dict[str, set]) -> set:
+    """Names of the entries in directory, listed on first use and cached"""
+    names = cache.get(directory)
+    if names is None:
+        with os.scandir(directory) as entries:
+            names = cache[directory] = {entry.name for entry in entries}
+    return names
+
 def process_pdfs():
     """Process all PDFs in the Resources directory"""
     resources_dir = "Resources"
     output_dir = "output"
     error_dir = os.path.join(output_dir, "errors")
+    cache_dir = os.path.join(output_dir, "cache")
+    
+    config = load_config()
+    # Check the setting up front instead of failing every PDF in the workers
+    get_max_pages(config)
+    # "jsonl" writes every invoice to one stream instead of a JSON file per invoice
+    jsonl_output = config.get("output_format", "json") == "jsonl"
+    # Byte offset of each invoice in invoices.jsonl, keyed by its unique name
+    invoice_index = {}
     
     # Create output directories if they don't exist
-    for directory in [output_dir, error_dir]:
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-    
-    # Get all PDF files in Resources directory and its subdirectories
-    pdf_files = []
-    for root, _, files in os.walk(resources_dir):
-        for f in files:
-            if f.endswith('.pdf'):
-                # Store full path relative to resources_dir
-                rel_path = os.path.relpath(os.path.join(root, f), resources_dir)
-                pdf_files.append(rel_path)
+    for directory in [output_dir, error_dir, cache_dir]:
+        os.makedirs(directory, exist_ok=True)
+    # Directories known to exist, so each company directory is created once per run,
+    # and the file names already taken in each output directory
+    created_dirs = {output_dir, error_dir, cache_dir}
+    dir_names = {}
+    
+    # Get all PDF files in Resources directory and its subdirectories,
+    # with their paths relative to resources_dir and their company directory
+    pdf_files = list(find_pdf_files(resources_dir))
     
     if not pdf_files:
         logging.warning("No PDF files found in Resources directory")
@@ -443,155 +894,178 @@ def process_pdfs():
     success_count = 0
     error_count = 0
     
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(resources_dir, pdf_file)
-        # Get the company name from the subdirectory
-        company_dir = os.path.dirname(pdf_file)
-        if company_dir:
-            company_name = os.path.basename(company_dir).replace('&', ' & ')
-        logging.info(f"Processing {pdf_file}")
+    # Extract and parse the PDFs in parallel; outputs are written below in
+    # the original file order so duplicate invoice numbers resolve the same way.
+    # Each worker is handed the configuration once instead of reading config.json per PDF.
+    # The default pool size is one worker per CPU, capped where Windows requires it
+    with ProcessPoolExecutor(initializer=_init_worker, initargs=(config,)) as executor, contextlib.ExitStack() as streams:
+        if jsonl_output:
+            invoice_stream = streams.enter_context(open(os.path.join(output_dir, "invoices.jsonl"), 'wb', buffering=1 << 20))
+            metadata_stream = streams.enter_context(open(os.path.join(output_dir, "metadata.jsonl"), 'wb', buffering=1 << 20))
         
-        try:
-            # Extract text from PDF
-            text = extract_text_from_pdf(pdf_path)
-            if not text.strip():
-                raise ValueError("No text content extracted from PDF")
-            
-            # Log raw extracted text for debugging
-            logging.debug(f"Raw extracted text from {pdf_file}:\n{text}")
-            
-            # Clean the extracted text
-            text = clean_text(text)
-            
-            # Log cleaned text for debugging
-            logging.debug(f"Cleaned text from {pdf_file}:\n{text}")
+        futures = [
+            executor.submit(extract_pdf_data, pdf_path, pdf_file, company_dir, cache_dir)
+            for pdf_path, pdf_file, company_dir in pdf_files
+        ]
+    
+        for (pdf_path, pdf_file, company_dir), future in zip(pdf_files, futures):
+            # Shared by the output and error records of this PDF
+            base_filename = os.path.splitext(os.path.basename(pdf_file))[0]
+            # Reset so the error handlers never report the previous PDF's results
+            text, data = None, None
+        
+            try:
+                # Wait for the worker, re-raising any extraction error here
+                try:
+                    text, data = future.result()
+                finally:
+                    # Stamped once the worker is done, whether it succeeded or raised
+                    now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
-            # Parse the content
-            data = parse_pdf_content(text, company_dir)
+                # Validate the extracted data
+                validate_data(data)
             
-            # Validate the extracted data
-            validate_data(data)
+                # Prepare metadata separately
+                metadata = {
+                    "source_file": pdf_file,
+                    "extraction_date": now_str,
+                    "version": "1.0",
+                    "invoice_number": data.get("Invoice Number", ""),
+                    "supplier": data.get("Supplier", ""),
+                    "processing_status": "success"
+                }
             
-            # Prepare metadata separately
-            metadata = {
-                "source_file": pdf_file,
-                "extraction_date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                "version": "1.0",
-                "invoice_number": data.get("Invoice Number", ""),
-                "supplier": data.get("Supplier", ""),
-                "processing_status": "success"
-            }
+                # Create output filenames based on invoice number or original filename
+                invoice_number_clean = (data['Invoice Number'] or base_filename).replace("/", "_").replace("\\", "_")
+                
+                if jsonl_output:
+                    # Append one line per invoice and metadata record, in the same order
+                    unique_name = invoice_number_clean
+                    counter = 1
+                    while unique_name in invoice_index:
+                        unique_name = f"{invoice_number_clean}_{counter:02d}"
+                        counter += 1
+                    if counter > 1:
+                        logging.warning(f"Duplicate invoice number detected: {invoice_number_clean}. Using unique suffix for {pdf_file}")
+                    
+                    invoice_index[unique_name] = invoice_stream.tell()
+                    # orjson appends the newline itself, avoiding a bytes concatenation per record
+                    invoice_stream.write(orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE))
+                    metadata_stream.write(orjson.dumps(metadata, option=orjson.OPT_APPEND_NEWLINE))
+                    
+                    logging.info(f"Successfully processed {pdf_file} -> invoices.jsonl [{unique_name}]")
+                    success_count += 1
+                    continue
             
-            # Create output filenames based on invoice number or original filename
-            invoice_number_clean = (data['Invoice Number'] or os.path.splitext(os.path.basename(pdf_file))[0]).replace("/", "_").replace("\\", "_")
+                # Create company-specific output directories
+                company_output_dir = os.path.join(output_dir, company_dir) if company_dir else output_dir
+                company_metadata_dir = os.path.join(output_dir, "metadata", company_dir) if company_dir else os.path.join(output_dir, "metadata")
             
-            # Create company-specific output directories
-            company_output_dir = os.path.join(output_dir, company_dir) if company_dir else output_dir
-            company_metadata_dir = os.path.join(output_dir, "metadata", company_dir) if company_dir else os.path.join(output_dir, "metadata")
+                for directory in (company_output_dir, company_metadata_dir):
+                    if directory not in created_dirs:
+                        os.makedirs(directory, exist_ok=True)
+                        created_dirs.add(directory)
             
-            if not os.path.exists(company_output_dir):
-                os.makedirs(company_output_dir)
-            if not os.path.exists(company_metadata_dir):
-                os.makedirs(company_metadata_dir)
+                # Invoice and metadata files are wrapped in array brackets; serialized
+                # before the files are created
+                invoice_payload = orjson.dumps([data], option=orjson.OPT_INDENT_2)
+                metadata_payload = orjson.dumps([metadata], option=orjson.OPT_INDENT_2)
             
-            # Handle potential duplicate invoice numbers by checking if file already exists
-            base_name = invoice_number_clean
-            invoice_filename = f"invoice_{base_name}.json"
-            metadata_filename = f"metadata_{base_name}.json"
-            invoice_path = os.path.join(company_output_dir, invoice_filename)
-            metadata_path = os.path.join(company_metadata_dir, metadata_filename)
+                # Handle potential duplicate invoice numbers. Names already taken in each
+                # directory (listed once) are skipped without a syscall; O_EXCL then creates
+                # the pair atomically, so a file written since the listing is never overwritten
+                invoice_names = _dir_names(company_output_dir, dir_names)
+                metadata_names = _dir_names(company_metadata_dir, dir_names)
+                base_name = invoice_number_clean
+                unique_name = base_name
             
-            counter = 1
-            while os.path.exists(invoice_path) or os.path.exists(metadata_path):
-                # Add counter suffix to make filename unique
-                unique_name = f"{base_name}_{counter:02d}"
-                invoice_filename = f"invoice_{unique_name}.json"
-                metadata_filename = f"metadata_{unique_name}.json"
-                invoice_path = os.path.join(company_output_dir, invoice_filename)
-                metadata_path = os.path.join(company_metadata_dir, metadata_filename)
-                counter += 1
+                counter = 1
+                while True:
+                    invoice_filename = f"invoice_{unique_name}.json"
+                    metadata_filename = f"metadata_{unique_name}.json"
+                    if invoice_filename not in invoice_names and metadata_filename not in metadata_names:
+                        if _write_exclusive([(os.path.join(company_output_dir, invoice_filename), invoice_payload),
+                                             (os.path.join(company_metadata_dir, metadata_filename), metadata_payload)]):
+                            break
+                    
+                    # Add counter suffix to make filename unique
+                    unique_name = f"{base_name}_{counter:02d}"
+                    counter += 1
                 
-                # Log the duplicate detection
-                if counter == 2:  # Only log on first duplicate
+                # Log the duplicate detection once per PDF
+                if unique_name != base_name:
                     logging.warning(f"Duplicate invoice number detected: {base_name}. Using unique suffix for {pdf_file}")
+                
+                invoice_names.add(invoice_filename)
+                metadata_names.add(metadata_filename)
             
-            # Save invoice JSON file (without metadata) - wrapped in array brackets
-            with open(invoice_path, 'w', encoding='utf-8') as f:
-                json.dump([data], f, indent=4, ensure_ascii=False)
-            
-            # Save metadata JSON file separately - wrapped in array brackets
-            with open(metadata_path, 'w', encoding='utf-8') as f:
-                json.dump([metadata], f, indent=4, ensure_ascii=False)
-            
-            logging.info(f"Successfully processed {pdf_file} -> {invoice_filename} + metadata/{company_dir}/{metadata_filename}")
-            success_count += 1
+                logging.info(f"Successfully processed {pdf_file} -> {invoice_filename} + metadata/{company_dir}/{metadata_filename}")
+                success_count += 1
             
-        except ValidationError as ve:
-            error_count += 1
-            logging.error(f"Validation error in {pdf_file}: {str(ve)}")
-            # Save detailed error information for review
-            error_data = {
-                "error_type": "Validation Error",
-                "error_message": str(ve),
-                "source_file": pdf_file,
-                "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                "extracted_data": data,  # Include what was extracted
-                "text_sample": text[:1000] if text else "No text extracted",  # First 1000 chars for debugging
-                "company_directory": company_dir
-            }
-            # Save error metadata separately
-            error_metadata = {
-                "source_file": pdf_file,
-                "extraction_date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                "version": "1.0",
-                "invoice_number": data.get("Invoice Number", "") if 'data' in locals() else "",
-                "supplier": data.get("Supplier", "") if 'data' in locals() else "",
-                "processing_status": "validation_error",
-                "error_message": str(ve)
-            }
+            except ValidationError as ve:
+                error_count += 1
+                logging.error(f"Validation error in {pdf_file}: {str(ve)}")
+                # Save detailed error information for review
+                error_data = {
+                    "error_type": "Validation Error",
+                    "error_message": str(ve),
+                    "source_file": pdf_file,
+                    "timestamp": now_str,
+                    "extracted_data": data,  # Include what was extracted
+                    "text_sample": text[:1000] if text else "No text extracted",  # First 1000 chars for debugging
+                    "company_directory": company_dir
+                }
+                # Save error metadata separately
+                error_metadata = {
+                    "source_file": pdf_file,
+                    "extraction_date": now_str,
+                    "version": "1.0",
+                    "invoice_number": data.get("Invoice Number", "") if data is not None else "",
+                    "supplier": data.get("Supplier", "") if data is not None else "",
+                    "processing_status": "validation_error",
+                    "error_message": str(ve)
+                }
             
-            base_filename = os.path.splitext(os.path.basename(pdf_file))[0]
-            error_file = os.path.join(error_dir, f"error_{base_filename}.json")
-            error_metadata_file = os.path.join(error_dir, f"error_metadata_{base_filename}.json")
+                error_file = os.path.join(error_dir, f"error_{base_filename}.json")
+                error_metadata_file = os.path.join(error_dir, f"error_metadata_{base_filename}.json")
             
-            with open(error_file, 'w', encoding='utf-8') as f:
-                json.dump(error_data, f, indent=4)
-            with open(error_metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(error_metadata, f, indent=4)
+                _write_json(error_file, error_data)
+                _write_json(error_metadata_file, error_metadata)
                 
-        except Exception as e:
-            error_count += 1
-            logging.error(f"Error processing {pdf_file}: {str(e)}", exc_info=True)
-            # Save detailed error information for review
-            error_data = {
-                "error_type": type(e).__name__,
-                "error_message": str(e),
-                "source_file": pdf_file,
-                "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                "extracted_data": data if 'data' in locals() else {},
-                "text_sample": text[:1000] if 'text' in locals() and text else "No text extracted",
-                "company_directory": company_dir,
-                "traceback": str(e)
-            }
-            # Save error metadata separately
-            error_metadata = {
-                "source_file": pdf_file,
-                "extraction_date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                "version": "1.0",
-                "invoice_number": data.get("Invoice Number", "") if 'data' in locals() and data else "",
-                "supplier": data.get("Supplier", "") if 'data' in locals() and data else "",
-                "processing_status": "processing_error",
-                "error_message": str(e)
-            }
+            except Exception as e:
+                error_count += 1
+                logging.error(f"Error processing {pdf_file}: {str(e)}", exc_info=True)
+                # Save detailed error information for review
+                error_data = {
+                    "error_type": type(e).__name__,
+                    "error_message": str(e),
+                    "source_file": pdf_file,
+                    "timestamp": now_str,
+                    "extracted_data": data if data is not None else {},
+                    "text_sample": text[:1000] if text else "No text extracted",
+                    "company_directory": company_dir,
+                    "traceback": str(e)
+                }
+                # Save error metadata separately
+                error_metadata = {
+                    "source_file": pdf_file,
+                    "extraction_date": now_str,
+                    "version": "1.0",
+                    "invoice_number": data.get("Invoice Number", "") if data else "",
+                    "supplier": data.get("Supplier", "") if data else "",
+                    "processing_status": "processing_error",
+                    "error_message": str(e)
+                }
             
-            base_filename = os.path.splitext(os.path.basename(pdf_file))[0]
-            error_file = os.path.join(error_dir, f"error_{base_filename}.json")
-            error_metadata_file = os.path.join(error_dir, f"error_metadata_{base_filename}.json")
+                error_file = os.path.join(error_dir, f"error_{base_filename}.json")
+                error_metadata_file = os.path.join(error_dir, f"error_metadata_{base_filename}.json")
             
-            with open(error_file, 'w', encoding='utf-8') as f:
-                json.dump(error_data, f, indent=4)
-            with open(error_metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(error_metadata, f, indent=4)
+                _write_json(error_file, error_data)
+                _write_json(error_metadata_file, error_metadata)
+    
+    if jsonl_output:
+        # Index lets a single invoice be read back with one seek into invoices.jsonl
+        _write_json(os.path.join(output_dir, "invoices_index.json"), invoice_index)
     
     # Log summary
     logging.info(f"Processing complete: {success_count} successful, {error_count} failed")